@@ -14,6 +14,7 @@ from math import log
 
 import util
 from line import Line
+from victim_cache import VictimCache
 
 
 class Cache:
@@ -29,7 +30,13 @@ class Cache:
     WRITE_BACK = "WB"
     WRITE_THROUGH = "WT"
 
-    def __init__(self, size, memory_size, block_size, mapping_policy, replacement_policy, write_policy):
+    # Set index functions
+    MODULO = "MOD"
+    XOR = "XOR"
+    SKEW = "SKEW"
+
+    def __init__(self, size, memory_size, block_size, mapping_policy, replacement_policy, write_policy,
+                 index_function=MODULO, victim_entries=0):
         self.size = size  # Cache size
         self.memory_size = memory_size  # Memory size
         self.block_size = block_size  # Block size
@@ -37,6 +44,7 @@ class Cache:
         self.mapping_policy = mapping_policy  # Mapping policy
         self.replacement_policy = replacement_policy  # Replacement policy
         self.write_policy = write_policy  # Write policy
+        self.index_function = index_function  # Set index function
 
         self.lines = [Line(block_size) for _ in range(self.size // self.block_size)]
 
@@ -44,20 +52,37 @@ class Cache:
         self.tag_offset = int(log(self.size // self.mapping_policy, 2))
         # bit offset of cache line set
         self.set_offset = int(log(self.block_size, 2))
+        # number of bits in the set number
+        self.set_bits = self.tag_offset - self.set_offset
+        # mask of the set number
+        self.set_mask = (1 << self.set_bits) - 1
+
+        # Small fully-associative cache holding lines evicted from the sets
+        self.victim_cache = VictimCache(victim_entries) if victim_entries else None
 
-    def load(self, address, data):
+        # tenant -> bitmask of the ways the tenant may allocate into
+        self.way_masks = {}
+        self.all_ways = list(range(self.mapping_policy))
+
+    def load(self, address, data, modified=0, tenant=0):
         """
         Load a block of memory into the cache.
 
         :param int address: memory address for data to load to cache
         :param list data: block of memory to load into cache
-        :return: tuple containing victim address and data (None if no victim)
+        :param int modified: whether the block is already dirty (e.g. when
+                             it is swapped in from the victim cache)
+        :param int tenant: tenant the block is loaded for, which may only
+                           replace lines in the ways of its way mask
+        :return: tuple containing victim address, data and owner if a
+                 modified line leaves the cache, otherwise an empty tuple
         """
 
         tag = self.get_tag(address)
         set = self.get_set(address)
+        ways = self.get_ways(tenant)
 
-        index = 0
+        index = ways[0]
         victim = None
 
         # Select the victim based on replacement policy
@@ -65,12 +90,14 @@ class Cache:
             self.replacement_policy == Cache.LFU or
             self.replacement_policy == Cache.FIFO):
             # Get the first line in the set
-            victim = set[0]
+            index = ways[0]
 
             # Obtain the least used line in the set
-            for index in range(len(set)):
-                if set[index].use < victim.use:
-                    victim = set[index]
+            for candidate in ways:
+                if set[candidate].use < set[index].use:
+                    index = candidate
+
+            victim = set[index]
 
             # Set the victims use bit to 0
             # to indicate that it is not used
@@ -82,22 +109,52 @@ class Cache:
 
         # Obtain random line in the set if using RAND replacement policy
         elif self.replacement_policy == Cache.RAND:
-            index = random.randint(0, self.mapping_policy - 1)
+            index = ways[random.randint(0, len(ways) - 1)]
             victim = set[index]
 
+        evicted = ()
+
+        if victim.valid and (self.victim_cache or victim.modified):
+            victim_address = self.get_physical_address(self.get_set_indices(address)[index])
+
+            if self.victim_cache:
+                # Hand the line to the victim cache, which writes back
+                # whatever it has to evict in turn
+                evicted = self.victim_cache.insert(victim_address, victim.data, victim.modified, victim.owner)
+            elif victim.modified:
+                evicted = (victim_address, victim.data, victim.owner)
+
         # Replace victim
-        victim.modified = 0
+        victim.modified = modified
         victim.valid = 1
         victim.tag = tag
         victim.data = data
+        victim.owner = tenant
+
+        return evicted
+
+    def fetch_victim(self, address, tenant=0):
+        """
+        Remove a block from the victim cache so it can be loaded back into
+        its set.
+
+        :param int address: memory address of the block to fetch
+        :param int tenant: tenant whose block to fetch
+        :return: tuple containing the block and its modified bit (None if the
+                 block is not in the victim cache)
+        """
+
+        if not self.victim_cache:
+            return None
 
-        return (index, victim.data) if victim.modified else ()
+        return self.victim_cache.fetch(address - self.get_offset(address), tenant)
 
-    def read(self, address):
+    def read(self, address, tenant=0):
         """
         Read a block of memory from the cache.
 
         :param int address: memory address for data to read from cache
+        :param int tenant: tenant reading, which only hits on its own lines
         :return: block of memory read from the cache (None if cache miss)
         """
 
@@ -108,7 +165,7 @@ class Cache:
 
         # Search for cache line in set
         for candidate in set:
-            if candidate.tag == tag and candidate.valid:
+            if candidate.tag == tag and candidate.valid and candidate.owner == tenant:
                 line = candidate
                 break
 
@@ -119,12 +176,13 @@ class Cache:
 
         return line.data if line else None
 
-    def write(self, address, byte):
+    def write(self, address, byte, tenant=0):
         """
         Write a byte to cache.
 
         :param int address: memory address for data to write to cache
         :param int byte: byte of data to write to cache
+        :param int tenant: tenant writing, which only hits on its own lines
         :return: boolean indicating whether data was written to cache
         """
 
@@ -135,7 +193,7 @@ class Cache:
 
         # Search for cache line in set
         for candidate in set:
-            if candidate.tag == tag and candidate.valid:
+            if candidate.tag == tag and candidate.valid and candidate.owner == tenant:
                 line = candidate
                 break
 
@@ -147,6 +205,10 @@ class Cache:
             if self.replacement_policy == Cache.LRU or self.replacement_policy == Cache.LFU:
                 self.update_use(line, set)
 
+        # Keep a copy of the line in the victim cache up to date
+        elif self.victim_cache:
+            self.victim_cache.write(address - self.get_offset(address), self.get_offset(address), byte, tenant)
+
         return True if line else False
 
     def print_section(self, start, amount):
@@ -198,12 +260,13 @@ class Cache:
         """
 
         set_number = index // self.mapping_policy
+        tag = self.lines[index].tag
 
-        tag = self.lines[index].tag << self.tag_offset
-        set = set_number << self.set_offset
+        # Undo the set index hash to recover the original set bits
+        set_number ^= self.hash_tag(tag, index % self.mapping_policy)
 
         return (
-            tag + set
+            (tag << self.tag_offset) + (set_number << self.set_offset)
         )
 
     def get_offset(self, address):
@@ -231,14 +294,110 @@ class Cache:
         :param int address: memory address to get set from.
         """
 
-        set_mask = (self.size // (self.block_size * self.mapping_policy)) - 1
-        set_number = (address >> self.set_offset) & set_mask
-        index = set_number * self.mapping_policy
+        if self.index_function == Cache.MODULO or not self.set_bits:
+            index = ((address >> self.set_offset) & self.set_mask) * self.mapping_policy
+
+            return self.lines[index:index + self.mapping_policy]
+
+        return [self.lines[i] for i in self.get_set_indices(address)]
+
+    def get_set_indices(self, address):
+        """
+        Get the indices of the cache lines making up the set of a physical
+        address, one per way.
+
+        With the MOD index function the set number is taken straight from the
+        address bits above the offset. XOR folds the low tag bits into the set
+        number so that power-of-two strides spread over every set, and SKEW
+        uses a different hash for every way so that blocks conflicting in one
+        way rarely conflict in the others.
+
+        :param int address: memory address to get set indices from.
+        """
+
+        set_number = (address >> self.set_offset) & self.set_mask
+
+        # The set's lines are contiguous unless the set number is hashed
+        if self.index_function == Cache.MODULO or not self.set_bits:
+            index = set_number * self.mapping_policy
+
+            return range(index, index + self.mapping_policy)
+
+        tag = self.get_tag(address)
+
+        return [
+            (set_number ^ self.hash_tag(tag, way)) * self.mapping_policy + way
+            for way in range(self.mapping_policy)
+        ]
+
+    def hash_tag(self, tag, way):
+        """
+        Get the value XORed into the set number of a tag for a given way.
+
+        :param int tag: cache line tag to hash.
+        :param int way: way of the set being indexed.
+        :return: int value to XOR into the set number (0 for MOD indexing).
+        """
+
+        if self.index_function == Cache.MODULO or not self.set_bits:
+            return 0
+
+        bits = tag & ((1 << self.set_bits) - 1)
+
+        if self.index_function == Cache.SKEW:
+            # Rotate the folded tag bits by the way number
+            shift = way % self.set_bits
+            bits = ((bits << shift) | (bits >> (self.set_bits - shift))) & ((1 << self.set_bits) - 1)
+
+        return bits
+
+    def get_ways(self, tenant):
+        """
+        Get the ways of a set that a tenant may allocate into.
+
+        :param int tenant: tenant to get the ways of.
+        :return: list of way numbers (every way if the tenant has no mask).
+        """
+
+        mask = self.way_masks.get(tenant)
+
+        if mask is None:
+            return self.all_ways
+
+        return [way for way in range(self.mapping_policy) if mask & (1 << way)]
+
+    def set_way_mask(self, tenant, mask):
+        """
+        Restrict the ways a tenant may allocate into, like Intel's Cache
+        Allocation Technology. Tenants may still hit on their lines in any way.
+
+        :param int tenant: tenant to set the way mask of.
+        :param int mask: bitmask of allowed ways (None to allow every way).
+        """
+
+        if mask is None:
+            self.way_masks.pop(tenant, None)
+            return
+
+        if not mask & ((1 << self.mapping_policy) - 1):
+            raise IndexError
+
+        self.way_masks[tenant] = mask & ((1 << self.mapping_policy) - 1)
+
+    def get_occupancy(self):
+        """
+        Get the number of valid lines owned by every tenant.
+
+        :return: dict of tenant -> number of valid lines.
+        """
+
+        occupancy = {}
 
-        start = index
-        end = index + self.mapping_policy
+        for line in self.lines:
+            if line.valid:
+                occupancy[line.owner] = occupancy.get(line.owner, 0) + 1
 
-        return self.lines[start:end]
+        return occupancy
 
     def get_size(self):
         """
@@ -17,4 +17,5 @@ class Line:
         self.modified = 0
         self.valid = 0
         self.tag = 0
+        self.owner = 0
         self.data = [0] * size
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""miss_classifier.py - classifies cache misses as compulsory, capacity or conflict.
+See README.md or https://github.com/nicholasadamou/cpu-cache-simulator
+for more information.
+
+Copyright (C) Nicholas Adamou 2019
+cpu-cache-simulator is released under the Apache 2.0 license. See
+LICENSE for the full license text.
+"""
+
+from collections import OrderedDict
+
+
+class MissClassifier:
+    """
+    Class classifying cache misses using the three C's model.
+
+    A miss is compulsory if the block has never been accessed before. Otherwise
+    it is a capacity miss if a fully-associative LRU cache with the same number
+    of lines would also have missed, and a conflict miss if it would have hit.
+    Blocks are told apart by tenant, since every tenant has its own address
+    space.
+
+    When given a number of ways, it also runs a tag-only LRU cache of the
+    same geometry with plain modulo set indexing, counting the conflict
+    misses that cache would have taken. Comparing them against the cache's
+    own conflict misses shows how many a hashed index function removes.
+    The baseline is always LRU, whatever the cache's replacement policy.
+    """
+
+    # Miss types
+    COMPULSORY = "compulsory"
+    CAPACITY = "capacity"
+    CONFLICT = "conflict"
+
+    def __init__(self, lines, block_size, ways=None):
+        self.lines = lines  # Number of lines in the cache
+        self.block_size = block_size  # Block size
+        self.ways = ways  # Ways of the modulo-indexed baseline (None for no baseline)
+
+        self.seen = set()  # every (tenant, block address) accessed so far
+        self.shadow = OrderedDict()  # fully-associative LRU cache of (tenant, block address)
+
+        self.misses = {
+            MissClassifier.COMPULSORY: 0,
+            MissClassifier.CAPACITY: 0,
+            MissClassifier.CONFLICT: 0
+        }
+
+        self.baseline = {}  # set number -> LRU list of (tenant, block address), most recent first
+        self.baseline_conflicts = 0
+
+    def access(self, address, hit, tenant=0):
+        """
+        Record an access and classify it if it missed.
+
+        :param int address: memory address being accessed
+        :param bool hit: whether the access hit in the cache
+        :param int tenant: tenant making the access
+        :return: type of miss (None if the access hit)
+        """
+
+        block = (tenant, address - (address % self.block_size))
+        kind = None
+
+        if not hit:
+            if block not in self.seen:
+                kind = MissClassifier.COMPULSORY
+            elif block in self.shadow:
+                kind = MissClassifier.CONFLICT
+            else:
+                kind = MissClassifier.CAPACITY
+
+            self.misses[kind] += 1
+
+        if self.ways:
+            self.access_baseline(block)
+
+        self.seen.add(block)
+        self.shadow[block] = True
+        self.shadow.move_to_end(block)
+
+        if len(self.shadow) > self.lines:
+            self.shadow.popitem(last=False)
+
+        return kind
+
+    def access_baseline(self, block):
+        """
+        Record an access in the modulo-indexed baseline cache, counting it if
+        it is a conflict miss there. Must run before the access is recorded
+        in the fully-associative shadow cache.
+
+        :param tuple block: tenant and address of the block being accessed
+        """
+
+        set_number = (block[1] // self.block_size) % (self.lines // self.ways)
+        stack = self.baseline.setdefault(set_number, [])
+
+        if block in stack:
+            stack.remove(block)
+        elif block in self.shadow:
+            self.baseline_conflicts += 1
+
+        stack.insert(0, block)
+        del stack[self.ways:]
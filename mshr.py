@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""mshr.py - represents the miss status holding registers of a non-blocking cache.
+See README.md or https://github.com/nicholasadamou/cpu-cache-simulator
+for more information.
+
+Copyright (C) Nicholas Adamou 2019
+cpu-cache-simulator is released under the Apache 2.0 license. See
+LICENSE for the full license text.
+"""
+
+
+class MSHRFile:
+    """
+    Class representing the miss status holding registers (MSHRs) of a
+    non-blocking cache.
+
+    Every access, hit or miss, spends hit_latency cycles on the tag lookup
+    before the next one issues. A primary miss then allocates an MSHR and
+    completes miss_latency cycles later, while later accesses keep issuing
+    underneath it. A secondary miss to a block that is already in flight is
+    merged into the existing MSHR. The processor only stalls when a primary
+    miss finds every MSHR busy.
+    """
+
+    def __init__(self, entries, block_size, hit_latency=1, miss_latency=100):
+        self.entries = entries  # Number of MSHRs
+        self.block_size = block_size  # Block size
+        self.hit_latency = hit_latency  # Cycles taken by the tag lookup of every access
+        self.miss_latency = miss_latency  # Cycles taken to fetch a block from memory
+
+        self.in_flight = {}  # (tenant, block address) -> cycle the fill completes
+
+        self.cycle = 0
+        self.accesses = 0
+        self.primary_misses = 0
+        self.secondary_misses = 0
+        self.stall_cycles = 0
+        self.occupancy_cycles = 0  # sum of outstanding misses over every cycle
+        self.busy_cycles = 0  # cycles with at least one outstanding miss
+        self.peak_occupancy = 0
+
+    def access(self, address, hit, tenant=0):
+        """
+        Issue an access to the cache and advance the clock.
+
+        :param int address: memory address being accessed
+        :param bool hit: whether the block was present in the cache
+        :param int tenant: tenant making the access
+        """
+
+        block = (tenant, address - (address % self.block_size))
+
+        self.accesses += 1
+        self.advance(self.cycle + self.hit_latency)
+
+        if block in self.in_flight:
+            # The block was loaded by an earlier miss that has not returned yet
+            self.secondary_misses += 1
+        elif not hit:
+            if len(self.in_flight) >= self.entries:
+                # Every MSHR is busy, so wait for the oldest fill to return
+                ready = min(self.in_flight.values())
+
+                self.stall_cycles += ready - self.cycle
+                self.advance(ready)
+
+            self.in_flight[block] = self.cycle + self.miss_latency
+            self.primary_misses += 1
+            self.peak_occupancy = max(self.peak_occupancy, len(self.in_flight))
+
+    def advance(self, cycle):
+        """
+        Advance the clock to a given cycle, retiring any MSHRs whose fill has
+        completed along the way.
+
+        :param int cycle: cycle to advance the clock to
+        """
+
+        while self.cycle < cycle:
+            ready = min(self.in_flight.values()) if self.in_flight else cycle
+            step = min(ready, cycle) - self.cycle
+
+            if self.in_flight:
+                self.occupancy_cycles += len(self.in_flight) * step
+                self.busy_cycles += step
+
+            self.cycle += step
+
+            for block in [b for b, done in self.in_flight.items() if done <= self.cycle]:
+                del self.in_flight[block]
+
+    def get_cycles(self):
+        """
+        Returns the number of cycles taken so far, including the time still
+        needed for every outstanding miss to complete.
+
+        :return: int Cycles taken by the non-blocking cache.
+        """
+
+        return max([self.cycle] + list(self.in_flight.values()))
+
+    def get_mlp(self):
+        """
+        Returns the memory-level parallelism, i.e. the average number of
+        outstanding misses over the cycles where at least one was outstanding.
+
+        :return: float Memory-level parallelism.
+        """
+
+        return self.occupancy_cycles / self.busy_cycles if self.busy_cycles else 0.0
+
+    def get_occupancy(self):
+        """
+        Returns the average number of busy MSHRs over every cycle.
+
+        :return: float Average MSHR occupancy.
+        """
+
+        return self.occupancy_cycles / self.cycle if self.cycle else 0.0
+
+    def get_blocking_cycles(self):
+        """
+        Returns the number of cycles a blocking cache would have taken for the
+        same accesses, where every miss is fully serialized.
+
+        :return: int Cycles taken by a blocking cache.
+        """
+
+        return self.accesses * self.hit_latency + self.primary_misses * self.miss_latency
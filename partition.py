@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""partition.py - utility-based partitioning of a shared cache's ways.
+See README.md or https://github.com/nicholasadamou/cpu-cache-simulator
+for more information.
+
+Copyright (C) Nicholas Adamou 2019
+cpu-cache-simulator is released under the Apache 2.0 license. See
+LICENSE for the full license text.
+"""
+
+
+class UtilityPartitioner:
+    """
+    Class dynamically partitioning the ways of a shared cache between
+    tenants based on how many hits each extra way would give them.
+
+    Every tenant has a utility monitor: a tag directory for a sample of the
+    sets that is managed as if the tenant owned the whole cache, counting
+    the hits at each position of the LRU stack. Every interval accesses the
+    ways are handed out greedily to whichever tenant gains the most hits per
+    way, the cache's way masks are updated and the counters are halved.
+    """
+
+    def __init__(self, cache, interval, sample=1):
+        self.cache = cache  # Cache being partitioned
+        self.interval = interval  # Accesses between repartitions
+        self.sample = sample  # Monitor one out of every sample sets
+
+        self.sets = cache.size // (cache.block_size * cache.mapping_policy)
+
+        self.monitors = {}  # tenant -> {set number -> LRU stack of blocks}
+        self.counters = {}  # tenant -> hits at each LRU stack position
+        self.allocation = {}  # tenant -> number of ways
+
+        self.accesses = 0
+        self.repartitions = 0
+
+    def access(self, address, tenant):
+        """
+        Record an access in the tenant's utility monitor, repartitioning the
+        cache once the interval has elapsed.
+
+        :param int address: memory address being accessed
+        :param int tenant: tenant making the access
+        """
+
+        if tenant not in self.monitors:
+            self.monitors[tenant] = {}
+            self.counters[tenant] = [0] * self.cache.mapping_policy
+
+        block = address >> self.cache.set_offset
+        set_number = block % self.sets
+
+        if set_number % self.sample == 0:
+            stack = self.monitors[tenant].setdefault(set_number, [])
+
+            if block in stack:
+                self.counters[tenant][stack.index(block)] += 1
+                stack.remove(block)
+
+            stack.insert(0, block)
+            del stack[self.cache.mapping_policy:]
+
+        self.accesses += 1
+
+        if self.accesses % self.interval == 0:
+            self.repartition()
+
+    def repartition(self):
+        """
+        Hand out the ways using the lookahead algorithm and apply them to the
+        cache as contiguous way masks, replacing any mask already set.
+        """
+
+        tenants = sorted(self.counters)
+        ways = self.cache.mapping_policy
+
+        # Every tenant needs at least one way to allocate into
+        if not tenants or len(tenants) > ways:
+            return
+
+        allocation = {tenant: 1 for tenant in tenants}
+        balance = ways - len(tenants)
+
+        while balance:
+            best = None
+
+            for tenant in tenants:
+                utility, extra = self.get_marginal_utility(tenant, allocation[tenant], balance)
+
+                if best is None or utility > best[0]:
+                    best = (utility, extra, tenant)
+
+            utility, extra, tenant = best
+
+            allocation[tenant] += extra
+            balance -= extra
+
+        way = 0
+
+        for tenant in tenants:
+            self.cache.set_way_mask(tenant, ((1 << allocation[tenant]) - 1) << way)
+            way += allocation[tenant]
+
+        self.allocation = allocation
+        self.repartitions += 1
+
+        # Decay the counters so the partition follows phase changes
+        for tenant in tenants:
+            self.counters[tenant] = [hits // 2 for hits in self.counters[tenant]]
+
+    def get_marginal_utility(self, tenant, allocated, balance):
+        """
+        Get the best number of hits per way a tenant would gain from up to
+        balance extra ways.
+
+        :param int tenant: tenant to get the marginal utility of.
+        :param int allocated: number of ways the tenant already has.
+        :param int balance: number of ways still to be handed out.
+        :return: tuple of the hits per way and the number of extra ways.
+        """
+
+        counters = self.counters[tenant]
+        best = (-1, 1)
+
+        for extra in range(1, balance + 1):
+            hits = sum(counters[allocated:allocated + extra])
+
+            if hits / extra > best[0]:
+                best = (hits / extra, extra)
+
+        return best
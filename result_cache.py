@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""result_cache.py - on-disk cache of simulation results.
+See README.md or https://github.com/nicholasadamou/cpu-cache-simulator
+for more information.
+
+Copyright (C) Nicholas Adamou 2019
+cpu-cache-simulator is released under the Apache 2.0 license. See
+LICENSE for the full license text.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import tempfile
+
+from simulator import VERSION, Simulator
+from traces import CHAMPSIM_RECORD, COMPRESSED, FORMATS, open_trace, replay
+
+# Size of the chunks a trace is hashed in
+HASH_CHUNK_SIZE = 1 << 20
+
+
+class ResultCache:
+    """
+    Class representing an on-disk cache of simulation results, keyed by the
+    content of the trace, the simulator's configuration and the simulator's
+    version.
+
+    Every entry stores the stats of a run along with a pickle of the
+    simulator at the end of the trace, so that a trace that has only been
+    appended to can resume from the longest cached prefix instead of being
+    replayed from the start. Entries are evicted least recently used first
+    once the cache grows beyond max_size bytes.
+    """
+
+    def __init__(self, directory, max_size=256 << 20):
+        self.directory = directory  # Directory holding the entries
+        self.max_size = max_size  # Maximum size of the entries in bytes
+
+        os.makedirs(directory, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self.resumes = 0
+
+    def simulate(self, trace, trace_format, config):
+        """
+        Get the stats of replaying a trace into a simulator, running the
+        simulation only if the result is not already cached.
+
+        :param str trace: path of the trace file.
+        :param str trace_format: format of the trace file (see traces.FORMATS).
+        :param dict config: keyword arguments to create the Simulator with.
+        :return: dict of stats as returned by Simulator.get_stats().
+        """
+
+        config_key = self.get_config_key(trace_format, config)
+        candidates = [
+            entry for entry in self.get_entries()
+            if entry["config_key"] == config_key
+        ]
+
+        trace_hash, length, prefixes = self.hash_trace(trace, [entry["length"] for entry in candidates])
+        key = hashlib.sha256((config_key + trace_hash).encode()).hexdigest()
+
+        for entry in candidates:
+            if entry["key"] == key:
+                self.hits += 1
+                self.touch(key)
+
+                return self.decode_stats(entry["stats"])
+
+        self.misses += 1
+
+        prefix = None
+
+        for entry in candidates:
+            prefix_hash, last = prefixes.get(entry["length"], (None, None))
+
+            if (prefix_hash == entry["trace_hash"] and
+                    self.can_resume(trace, trace_format, entry["length"], last) and
+                    (prefix is None or entry["length"] > prefix["length"])):
+                prefix = entry
+
+        if prefix:
+            try:
+                with open(self.get_path(prefix["key"], ".pickle"), "rb") as file:
+                    simulator = pickle.load(file)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                # Prefix evicted by another run since it was listed, so
+                # replay the whole trace instead
+                prefix = None
+            else:
+                self.resumes += 1
+                self.touch(prefix["key"])
+
+        if not prefix:
+            simulator = Simulator(verbose=False, **config)
+
+        file = open(trace, "rb") if prefix else open_trace(trace)
+
+        with file:
+            if prefix:
+                file.seek(prefix["length"])
+
+            replay(simulator, FORMATS[trace_format](file, simulator.memory.get_block_size()))
+
+        stats = simulator.get_stats()
+
+        self.store(key, simulator, {
+            "key": key,
+            "config_key": config_key,
+            "trace_hash": trace_hash,
+            "length": length,
+            "stats": stats
+        })
+        self.evict()
+
+        return stats
+
+    def can_resume(self, trace, trace_format, length, last):
+        """
+        Check whether a trace can be resumed from the end of a prefix.
+        Compressed traces cannot be seeked into, and the prefix must not end
+        in the middle of a record.
+
+        :param str trace: path of the trace file.
+        :param str trace_format: format of the trace file.
+        :param int length: length of the prefix in bytes.
+        :param bytes last: last byte of the prefix.
+        :return: boolean indicating whether the trace can be resumed.
+        """
+
+        if os.path.splitext(trace)[1] in COMPRESSED:
+            return False
+
+        if trace_format == "champsim":
+            return length % CHAMPSIM_RECORD.size == 0
+
+        return last == b"\n"
+
+    def hash_trace(self, trace, lengths):
+        """
+        Hash the content of a trace file, along with its prefixes of the
+        given lengths.
+
+        :param str trace: path of the trace file.
+        :param list lengths: lengths in bytes of the prefixes to hash.
+        :return: tuple of the trace's hash, its length and a dict of
+                 prefix length -> (hash, last byte of the prefix).
+        """
+
+        digest = hashlib.sha256()
+        prefixes = {}
+        pending = sorted(set(lengths))
+        position = 0
+        last = b""
+
+        with open(trace, "rb") as file:
+            while True:
+                chunk = file.read(HASH_CHUNK_SIZE)
+
+                if not chunk:
+                    break
+
+                while pending and pending[0] <= position + len(chunk):
+                    cut = pending.pop(0) - position
+
+                    digest.update(chunk[:cut])
+                    position += cut
+                    last = chunk[cut - 1:cut] or last
+                    chunk = chunk[cut:]
+
+                    prefixes[position] = (digest.hexdigest(), last)
+
+                digest.update(chunk)
+                position += len(chunk)
+                last = chunk[-1:] or last
+
+        return digest.hexdigest(), position, prefixes
+
+    def get_config_key(self, trace_format, config):
+        """
+        Get the part of an entry's key that depends on everything but the
+        content of the trace.
+
+        :param str trace_format: format of the trace file.
+        :param dict config: keyword arguments to create the Simulator with.
+        :return: str hexadecimal key.
+        """
+
+        # Fill in the defaults so that omitting an argument and passing its
+        # default value give the same key
+        parameters = inspect.signature(Simulator).parameters
+        config = {
+            name: config.get(name, parameter.default)
+            for name, parameter in parameters.items() if name != "verbose"
+        }
+
+        return hashlib.sha256(json.dumps({
+            "version": VERSION,
+            "format": trace_format,
+            "config": config
+        }, sort_keys=True).encode()).hexdigest()
+
+    def get_entries(self):
+        """
+        Get the metadata of every entry in the cache.
+
+        :return: list of dicts of entry metadata.
+        """
+
+        entries = []
+
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                try:
+                    with open(os.path.join(self.directory, name)) as file:
+                        entries.append(json.load(file))
+                except (OSError, ValueError):
+                    # Entry evicted or being written by another run
+                    continue
+
+        return entries
+
+    def get_path(self, key, extension):
+        """
+        Get the path of one of an entry's files.
+
+        :param str key: key of the entry.
+        :param str extension: extension of the file (.json or .pickle).
+        :return: str path of the file.
+        """
+
+        return os.path.join(self.directory, key + extension)
+
+    def store(self, key, simulator, entry):
+        """
+        Write an entry to the cache, replacing each file atomically.
+
+        :param str key: key of the entry.
+        :param Simulator simulator: simulator at the end of the trace.
+        :param dict entry: metadata and stats of the entry.
+        """
+
+        for extension, write in (
+            (".pickle", lambda file: pickle.dump(simulator, file)),
+            (".json", lambda file: file.write(json.dumps(entry).encode()))
+        ):
+            # Every writer gets its own temporary file, so runs storing the
+            # same key at once cannot interleave their writes
+            with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as file:
+                try:
+                    write(file)
+                except BaseException:
+                    file.close()
+                    os.remove(file.name)
+                    raise
+
+            os.replace(file.name, self.get_path(key, extension))
+
+    def touch(self, key):
+        """
+        Mark an entry as recently used.
+
+        :param str key: key of the entry.
+        """
+
+        for extension in (".json", ".pickle"):
+            try:
+                os.utime(self.get_path(key, extension))
+            except OSError:
+                pass
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits in
+        max_size bytes.
+        """
+
+        entries = {}
+
+        for name in os.listdir(self.directory):
+            key, extension = os.path.splitext(name)
+
+            if extension in (".json", ".pickle"):
+                stat = os.stat(os.path.join(self.directory, name))
+                size, used = entries.get(key, (0, 0))
+                entries[key] = (size + stat.st_size, max(used, stat.st_mtime))
+
+        total = sum(size for size, used in entries.values())
+
+        for key in sorted(entries, key=lambda key: entries[key][1]):
+            if total <= self.max_size:
+                break
+
+            for extension in (".json", ".pickle"):
+                try:
+                    os.remove(self.get_path(key, extension))
+                except OSError:
+                    pass
+
+            total -= entries[key][0]
+
+    def decode_stats(self, stats):
+        """
+        Restore the tenant numbers of stats read back from JSON, which only
+        has string keys.
+
+        :param dict stats: stats as stored in an entry.
+        :return: dict of stats as returned by Simulator.get_stats().
+        """
+
+        stats["tenants"] = {int(tenant): value for tenant, value in stats["tenants"].items()}
+
+        return stats
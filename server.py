@@ -0,0 +1,456 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""server.py - local service hosting long-lived simulators.
+See README.md or https://github.com/nicholasadamou/cpu-cache-simulator
+for more information.
+
+Copyright (C) Nicholas Adamou 2019
+cpu-cache-simulator is released under the Apache 2.0 license. See
+LICENSE for the full license text.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from simulator import Simulator
+from traces import IFETCH, READ, WRITE, replay
+
+INVALID_REQUEST_ERROR = "invalid request"
+INVALID_ACCESS_ERROR = "invalid access"
+UNKNOWN_COMMAND_ERROR = "unknown command"
+UNKNOWN_SIMULATOR_ERROR = "unknown simulator"
+EXISTING_SIMULATOR_ERROR = "simulator already exists"
+
+# Simulators held by a worker process, by name
+SIMULATORS = {}
+
+
+class SimulationError(Exception):
+    """Exception raised by a client when the server rejects a request."""
+
+
+def create_simulator(name, config):
+    """
+    Create a quiet simulator. Runs in a worker process, which keeps it.
+
+    :param str name: name of the simulator.
+    :param dict config: keyword arguments to create the Simulator with.
+    """
+
+    SIMULATORS[name] = Simulator(verbose=False, **config)
+
+
+def delete_simulator(name):
+    """
+    Remove a simulator. Runs in the worker process holding it.
+
+    :param str name: name of the simulator.
+    """
+
+    del SIMULATORS[name]
+
+
+def get_stats(name):
+    """
+    Get the stats of a simulator. Runs in the worker process holding it.
+
+    :param str name: name of the simulator.
+    :return: dict of stats as returned by Simulator.get_stats().
+    """
+
+    return SIMULATORS[name].get_stats()
+
+
+def run_batches(name, batches):
+    """
+    Replay several batches of accesses into a simulator one after another.
+    Runs in the worker process holding it.
+
+    :param str name: name of the simulator.
+    :param list batches: list of (accesses, tenant) tuples.
+    :return: list of the hits and misses of every batch, or of its error if
+             it failed.
+    """
+
+    simulator = SIMULATORS[name]
+    results = []
+
+    for accesses, tenant in batches:
+        hits, misses = simulator.hits, simulator.misses
+
+        try:
+            replay(simulator, [accesses], tenant)
+        except Exception as error:
+            results.append({"error": str(error) or type(error).__name__})
+            continue
+
+        results.append({
+            "hits": simulator.hits - hits,
+            "misses": simulator.misses - misses
+        })
+
+    return results
+
+
+class SimulationServer:
+    """
+    Class representing a service hosting long-lived, named simulators.
+
+    Requests are dicts with a command and its arguments:
+
+    * create NAME CONFIG - create a simulator from Simulator keyword arguments
+    * access NAME ACCESSES TENANT - replay a list of [op, address] accesses
+    * stats NAME - get the stats of a simulator
+    * delete NAME - remove a simulator
+    * list - get the names of every simulator
+
+    Every simulator lives in one of a fixed number of single-process
+    workers for its whole life, so only accesses and results cross the
+    process boundary. Requests for a simulator are queued and handled in
+    order by a single task per simulator, and access batches that queue up
+    behind each other are coalesced into one replay in the worker.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = [ProcessPoolExecutor(1) for _ in range(workers or os.cpu_count() or 1)]
+
+        self.simulators = {}  # name -> worker holding the simulator
+        self.queues = {}  # name -> list of (command, arguments, future)
+        self.tasks = {}  # name -> task handling the queue
+
+        self.batches = 0
+        self.replays = 0
+
+    async def handle(self, request):
+        """
+        Handle a request.
+
+        :param dict request: request with a command and its arguments.
+        :return: dict response, containing an error on failure.
+        """
+
+        try:
+            if not isinstance(request, dict):
+                raise SimulationError(INVALID_REQUEST_ERROR)
+
+            command = request.get("command")
+            name = request.get("name")
+            arguments = None
+
+            if command == "list":
+                return {"names": sorted(self.simulators)}
+
+            if command == "create":
+                if not isinstance(name, str) or not isinstance(request.get("config", {}), dict):
+                    raise SimulationError(INVALID_REQUEST_ERROR)
+
+                if name in self.simulators:
+                    raise SimulationError(EXISTING_SIMULATOR_ERROR)
+
+                arguments = request.get("config", {})
+
+                # Place the simulator on the worker holding the fewest
+                loads = [list(self.simulators.values()).count(worker) for worker in self.workers]
+                self.simulators[name] = self.workers[loads.index(min(loads))]
+                self.queues[name] = []
+
+            elif command not in ("access", "stats", "delete"):
+                raise SimulationError(UNKNOWN_COMMAND_ERROR)
+
+            elif not isinstance(name, str) or name not in self.simulators:
+                raise SimulationError(UNKNOWN_SIMULATOR_ERROR)
+
+            elif command == "access":
+                # Validate before queueing so that a bad batch never fails the
+                # batches it would have been coalesced with
+                arguments = self.get_batch(request)
+
+            future = asyncio.get_running_loop().create_future()
+            self.queues[name].append((command, arguments, future))
+
+            if name not in self.tasks:
+                self.tasks[name] = asyncio.create_task(self.drain(name))
+
+            return await future
+        except Exception as error:
+            return {"error": str(error) or type(error).__name__}
+
+    async def drain(self, name):
+        """
+        Handle the queued requests of a simulator until its queue is empty.
+
+        :param str name: name of the simulator.
+        """
+
+        loop = asyncio.get_running_loop()
+        queue = self.queues[name]
+        worker = self.simulators[name]
+
+        try:
+            while queue:
+                command, arguments, future = queue.pop(0)
+
+                # Requests may be cancelled while they wait (e.g. when their
+                # client goes away), so only resolve futures that are not done
+                try:
+                    if command == "create":
+                        await loop.run_in_executor(worker, create_simulator, name, arguments)
+
+                        if not future.done():
+                            future.set_result({"name": name})
+
+                    elif command == "stats":
+                        stats = await loop.run_in_executor(worker, get_stats, name)
+
+                        if not future.done():
+                            future.set_result({"stats": stats})
+
+                    elif command == "delete":
+                        await loop.run_in_executor(worker, delete_simulator, name)
+                        del self.simulators[name]
+
+                        if not future.done():
+                            future.set_result({"name": name})
+
+                        # Fail any requests that raced in behind the delete
+                        self.fail(queue, SimulationError(UNKNOWN_SIMULATOR_ERROR))
+
+                    elif command == "access":
+                        # Coalesce every access batch queued up behind this one
+                        futures = [future]
+                        batches = [arguments]
+
+                        while queue and queue[0][0] == "access":
+                            command, arguments, pending = queue.pop(0)
+                            futures.append(pending)
+                            batches.append(arguments)
+
+                        try:
+                            results = await loop.run_in_executor(worker, run_batches, name, batches)
+                        except Exception as error:
+                            results = [{"error": str(error) or type(error).__name__}] * len(futures)
+
+                        self.batches += len(batches)
+                        self.replays += 1
+
+                        for pending, result in zip(futures, results):
+                            if pending.done():
+                                continue
+
+                            if "error" in result:
+                                pending.set_exception(SimulationError(result["error"]))
+                            else:
+                                pending.set_result(result)
+
+                except Exception as error:
+                    if not future.done():
+                        future.set_exception(error)
+
+                    if command == "create":
+                        # The simulator was never created, so forget its name
+                        del self.simulators[name]
+                        self.fail(queue, SimulationError(UNKNOWN_SIMULATOR_ERROR))
+        finally:
+            del self.tasks[name]
+
+            if name not in self.simulators:
+                del self.queues[name]
+
+    def fail(self, queue, error):
+        """
+        Fail and remove every request in a queue.
+
+        :param list queue: queue of (command, arguments, future) tuples.
+        :param Exception error: exception to fail the requests with.
+        """
+
+        for _, _, future in queue:
+            if not future.done():
+                future.set_exception(error)
+
+        queue.clear()
+
+    def get_batch(self, request):
+        """
+        Get the accesses of an access request in the form replayed by
+        traces.replay.
+
+        :param dict request: access request.
+        :return: tuple of a list of (op, address, size) tuples and the tenant.
+        :raises SimulationError: if the accesses or the tenant are malformed.
+        """
+
+        accesses = request.get("accesses", [])
+        tenant = request.get("tenant", 0)
+
+        if not isinstance(accesses, list) or not isinstance(tenant, int):
+            raise SimulationError(INVALID_REQUEST_ERROR)
+
+        batch = []
+
+        for access in accesses:
+            if (not isinstance(access, (list, tuple)) or len(access) not in (2, 3) or
+                    access[0] not in (READ, WRITE, IFETCH) or
+                    not all(isinstance(value, int) and value >= 0 for value in access[1:])):
+                raise SimulationError("%s: %s" % (INVALID_ACCESS_ERROR, json.dumps(access)))
+
+            batch.append((access[0], access[1], access[2] if len(access) > 2 else 1))
+
+        return batch, tenant
+
+    async def serve_connection(self, reader, writer):
+        """
+        Serve a connection speaking newline-delimited JSON. Every request is
+        handled in its own task, and its response echoes the request's id.
+
+        :param asyncio.StreamReader reader: stream to read requests from.
+        :param asyncio.StreamWriter writer: stream to write responses to.
+        """
+
+        async def respond(request):
+            response = await self.handle(request)
+            response["id"] = request.get("id") if isinstance(request, dict) else None
+
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+
+        tasks = set()
+
+        try:
+            while True:
+                line = await reader.readline()
+
+                if not line:
+                    break
+
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    request = {"command": None}
+
+                task = asyncio.create_task(respond(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.wait(tasks)
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765, path=None):
+        """
+        Serve requests on a TCP socket, or on a Unix socket if a path is given.
+
+        :param str host: host to listen on.
+        :param int port: port to listen on.
+        :param str path: path of the Unix socket to listen on.
+        """
+
+        if path:
+            server = await asyncio.start_unix_server(self.serve_connection, path)
+        else:
+            server = await asyncio.start_server(self.serve_connection, host, port)
+
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        """Shut down the worker processes."""
+
+        for worker in self.workers:
+            worker.shutdown()
+
+
+class LocalClient:
+    """Class representing a client of a SimulationServer in the same process."""
+
+    def __init__(self, server):
+        self.server = server
+
+    async def request(self, command, **arguments):
+        """
+        Send a request to the server.
+
+        :param str command: command to send.
+        :return: dict response.
+        :raises SimulationError: if the server rejected the request.
+        """
+
+        response = await self.server.handle(dict(arguments, command=command))
+
+        if "error" in response:
+            raise SimulationError(response["error"])
+
+        return response
+
+    async def create(self, name, **config):
+        """
+        Create a named simulator.
+
+        :param str name: name of the simulator.
+        :param config: keyword arguments to create the Simulator with.
+        """
+
+        await self.request("create", name=name, config=config)
+
+    async def access(self, name, accesses, tenant=0):
+        """
+        Replay a batch of accesses into a simulator.
+
+        :param str name: name of the simulator.
+        :param list accesses: list of (op, address) or (op, address, size) accesses.
+        :param int tenant: tenant making the accesses.
+        :return: dict of the hits and misses of the batch.
+        """
+
+        return await self.request("access", name=name, accesses=accesses, tenant=tenant)
+
+    async def stats(self, name):
+        """
+        Get the stats of a simulator once every access sent before has been
+        replayed.
+
+        :param str name: name of the simulator.
+        :return: dict of stats as returned by Simulator.get_stats().
+        """
+
+        return (await self.request("stats", name=name))["stats"]
+
+    async def delete(self, name):
+        """
+        Remove a simulator.
+
+        :param str name: name of the simulator.
+        """
+
+        await self.request("delete", name=name)
+
+    async def list(self):
+        """
+        Get the names of every simulator.
+
+        :return: list of names.
+        """
+
+        return (await self.request("list"))["names"]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve long-lived cache simulators over a socket.")
+    parser.add_argument("--host", default="127.0.0.1", help="host to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on")
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, help="number of worker processes")
+    args = parser.parse_args()
+
+    server = SimulationServer(args.workers)
+
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
@@ -10,50 +10,86 @@ LICENSE for the full license text.
 """
 import random
 
-from pyfiglet import Figlet
-
 from math import log
 
 import util
 
 from cache import Cache
 from memory import Memory
+from miss_classifier import MissClassifier
+from mshr import MSHRFile
+from partition import UtilityPartitioner
+from traces import FORMATS, replay
+
+VERSION = "1.1.0"
 
 INVALID_RESPONSE = "\nERROR: invalid response, try again.\n"
 OUT_OF_BOUNDS_ERROR = "\nERROR: out of bounds\n"
 INCORRECT_SYNTAX_ERROR = "\nERROR: incorrect syntax\n"
+PARTITIONED_ERROR = "\nERROR: ways are partitioned by utility, so way masks cannot be set\n"
 
 REPLACEMENT_POLICIES = ["LRU", "LFU", "FIFO", "RAND"]
 WRITE_POLICIES = ["WB", "WT"]
+INDEX_FUNCTIONS = ["MOD", "XOR", "SKEW"]
 
 
 class Simulator:
     """Class modeling the processor cache simulator"""
 
-    def __init__(self, memory_size, cache_size, block_size, mapping_policy, replacement_policy, write_policy):
+    def __init__(self, memory_size, cache_size, block_size, mapping_policy, replacement_policy, write_policy,
+                 mshrs=0, hit_latency=1, miss_latency=100, index_function=Cache.MODULO, victim_entries=0,
+                 partition_interval=0, verbose=True):
         self.memory_size = memory_size
         self.cache_size = cache_size
         self.block_size = block_size
         self.mapping_policy = mapping_policy
         self.replacement_policy = replacement_policy
         self.write_policy = write_policy
+        self.index_function = index_function
+        self.victim_entries = victim_entries
+        self.verbose = verbose  # Print every write made to the cache or memory
 
         self.hits = 0
         self.misses = 0
+        self.victim_hits = 0
+        self.victim_conflict_hits = 0  # victim cache hits on conflict misses
+        self.tenant_stats = {}  # tenant -> {"hits": int, "misses": int}
 
         self.memory = Memory(
             2 ** memory_size,
             2 ** block_size
         )
+        self.memories = {0: self.memory}  # tenant -> main memory of its address space
         self.cache = Cache(
             2 ** cache_size,
             2 ** memory_size,
             2 ** block_size,
             2 ** mapping_policy,
             replacement_policy,
-            write_policy
+            write_policy,
+            index_function,
+            victim_entries
+        )
+        self.classifier = MissClassifier(
+            2 ** cache_size // 2 ** block_size,
+            2 ** block_size,
+            2 ** mapping_policy if index_function != Cache.MODULO else None
         )
 
+        # Non-blocking timing model, disabled when there are no MSHRs
+        self.mshr = MSHRFile(
+            mshrs,
+            2 ** block_size,
+            hit_latency,
+            miss_latency
+        ) if mshrs else None
+
+        # Utility-based way partitioning, disabled when there is no interval
+        self.partitioner = UtilityPartitioner(
+            self.cache,
+            partition_interval
+        ) if partition_interval else None
+
     def run(self):
         command = None
 
@@ -67,19 +103,21 @@ class Simulator:
                 command = operation[0]
                 params = operation[1:]
 
-                if command == 'write' and len(params) == 2:
+                if command == 'write' and len(params) in (2, 3):
                     address = int(params[0])
                     byte = params[1]
+                    tenant = int(params[2]) if len(params) == 3 else 0
 
                     # Make sure byte is a digit
                     if byte.isdigit():
                         byte = int(params[1])
 
-                    self.write(address, byte)
+                    self.write(address, byte, tenant)
 
-                elif command == 'read' and len(params) == 1:
+                elif command == 'read' and len(params) in (1, 2):
                     address = int(params[0])
-                    byte = self.read(address)
+                    tenant = int(params[1]) if len(params) == 2 else 0
+                    byte = self.read(address, tenant)
 
                     print(
                         "\nByte 0x%s (%s) read from %s in cache\n" % (
@@ -89,25 +127,55 @@ class Simulator:
                         )
                     )
 
-                elif command == "randread" and len(params) == 1:
+                elif command == "randread" and len(params) in (1, 2):
                     amount = int(params[0])
+                    tenant = int(params[1]) if len(params) == 2 else 0
 
                     for i in range(amount):
                         address = random.randint(0, self.memory.get_size() - 1)
-                        self.read(address)
+                        self.read(address, tenant)
 
                     print(
                         "\n%s bytes read from memory\n" %
                         amount
                     )
 
-                elif command == "randwrite" and len(params) == 1:
+                elif command == "randwrite" and len(params) in (1, 2):
                     amount = int(params[0])
+                    tenant = int(params[1]) if len(params) == 2 else 0
 
                     for i in range(amount):
                         address = random.randint(0, self.memory.get_size() - 1)
                         byte = util.rand_byte()
-                        self.write(address, byte)
+                        self.write(address, byte, tenant)
+
+                elif command == "waymask" and len(params) == 2:
+                    tenant = int(params[0])
+                    mask = None if params[1] == "all" else int(params[1], 2)
+
+                    # The partitioner would overwrite the mask on its next repartition
+                    if self.partitioner:
+                        print(PARTITIONED_ERROR)
+                    else:
+                        self.cache.set_way_mask(tenant, mask)
+
+                elif command == "trace" and len(params) in (2, 3):
+                    read_trace = FORMATS[params[0]]
+                    path = params[1]
+                    tenant = int(params[2]) if len(params) == 3 else 0
+
+                    verbose = self.verbose
+                    self.verbose = False
+
+                    try:
+                        amount = replay(self, read_trace(path, self.memory.get_block_size()), tenant)
+                    finally:
+                        self.verbose = verbose
+
+                    print(
+                        "\n%s accesses replayed from %s\n" %
+                        (amount, path)
+                    )
 
                 elif command == "printcache" and len(params) == 2:
                     start = int(params[0])
@@ -115,17 +183,64 @@ class Simulator:
 
                     self.cache.print_section(start, amount)
 
-                elif command == "printmem" and len(params) == 2:
+                elif command == "printmem" and len(params) in (2, 3):
                     start = int(params[0])
                     amount = int(params[1])
+                    tenant = int(params[2]) if len(params) == 3 else 0
 
-                    self.memory.print_section(start, amount)
+                    self.get_memory(tenant).print_section(start, amount)
 
                 elif command == "stats" and len(params) == 0:
-                    ratio = (self.hits / ((self.hits + self.misses) if self.misses else 1)) * 100
-
-                    print("\nHits: {0} | Misses: {1}".format(self.hits, self.misses))
-                    print("Hit/Miss Ratio: {0:.2f}%".format(ratio) + "\n")
+                    stats = self.get_stats()
+
+                    print("\nHits: {0} | Misses: {1}".format(stats["hits"], stats["misses"]))
+                    print("Hit/Miss Ratio: {0:.2f}%".format(stats["ratio"]))
+                    print("Compulsory: {0} | Capacity: {1} | Conflict: {2}".format(
+                        stats["compulsory_misses"],
+                        stats["capacity_misses"],
+                        stats["conflict_misses"]
+                    ))
+
+                    if "mod_conflict_misses" in stats:
+                        print("Conflict misses removed by {0} indexing: {1} ({2} with MOD indexing and LRU replacement)".format(
+                            self.index_function,
+                            stats["mod_conflict_misses"] - stats["conflict_misses"],
+                            stats["mod_conflict_misses"]
+                        ))
+
+                    if self.cache.victim_cache:
+                        print("Conflict misses removed by victim cache: {0} (of {1} victim cache hits)".format(
+                            stats["victim_conflict_hits"],
+                            stats["victim_hits"]
+                        ))
+
+                    for tenant, tenant_stats in sorted(stats["tenants"].items()):
+                        print("Tenant {0}: Hits: {1} | Misses: {2} | Lines: {3} | Ways: {4}".format(
+                            tenant,
+                            tenant_stats["hits"],
+                            tenant_stats["misses"],
+                            tenant_stats["occupancy"],
+                            util.bin_str(tenant_stats["way_mask"], self.cache.mapping_policy)
+                        ))
+
+                    if self.mshr:
+                        print("Cycles: {0} (blocking: {1}) | Stall cycles: {2}".format(
+                            stats["cycles"],
+                            stats["blocking_cycles"],
+                            stats["stall_cycles"]
+                        ))
+                        print("Primary misses: {0} | Secondary misses: {1}".format(
+                            stats["primary_misses"],
+                            stats["secondary_misses"]
+                        ))
+                        print("MLP: {0:.2f} | MSHR occupancy: {1:.2f} (peak {2} of {3})".format(
+                            stats["mlp"],
+                            stats["mshr_occupancy"],
+                            stats["peak_mshr_occupancy"],
+                            self.mshr.entries
+                        ))
+
+                    print()
 
                 elif command == 'help':
                     self.print_details()
@@ -137,61 +252,72 @@ class Simulator:
             except:
                 print(INCORRECT_SYNTAX_ERROR)
 
-    def read(self, address):
-        """Read a byte from cache."""
+    def read(self, address, tenant=0):
+        """Read a byte from cache on behalf of a tenant."""
+
+        cache_block = self.cache.read(address, tenant)
+        hit = cache_block is not None
 
-        cache_block = self.cache.read(address)
+        kind = self.classifier.access(address, hit, tenant)
+        self.record(address, hit, tenant)
 
-        if cache_block:
+        if hit:
             self.hits += 1
         else:
-            block = self.memory.get_block(address)
-            victim = self.cache.load(address, block)
-            cache_block = self.cache.read(address)
+            hit = self.allocate(address, tenant, kind)
+            cache_block = self.cache.read(address, tenant)
 
             self.misses += 1
 
-            # Write victim line's block to memory if replaced
-            if victim:
-                self.memory.set_block(victim[0], victim[1])
+        if self.mshr:
+            self.mshr.access(address, hit, tenant)
 
         return cache_block[self.cache.get_offset(address)]
 
-    def write(self, address, byte):
-        """Write a byte to cache."""
+    def write(self, address, byte, tenant=0):
+        """Write a byte to cache on behalf of a tenant."""
+
+        written = self.cache.write(address, byte, tenant)
+        hit = written
 
-        written = self.cache.write(address, byte)
+        kind = self.classifier.access(address, written, tenant)
+        self.record(address, written, tenant)
 
         if written:
             self.hits += 1
         else:
             self.misses += 1
 
+            if self.write_policy == Cache.WRITE_BACK:
+                # Write block to cache
+                hit = self.allocate(address, tenant, kind)
+                written = self.cache.write(address, byte, tenant)
+
+        if self.mshr:
+            # Write-through does not allocate on a miss, so the store is
+            # posted to memory without occupying an MSHR
+            self.mshr.access(address, hit or self.write_policy == Cache.WRITE_THROUGH, tenant)
+
         if self.write_policy == Cache.WRITE_THROUGH:
             # Write block to memory
-            block = self.memory.get_block(address)
+            memory = self.get_memory(tenant)
+            block = memory.get_block(address)
 
             block[self.cache.get_offset(address)] = byte
 
-            self.memory.set_block(address, block)
+            memory.set_block(address, block)
 
-            print()
-            print("Byte 0x%s (%s) written to block %s @ %s in main memory\n" % (
-                    util.hex_str(byte, 2),
-                    byte,
-                    self.memory.get_block(address),
-                    util.bin_str(address, self.memory_size)
+            if self.verbose:
+                print()
+                print("Byte 0x%s (%s) written to block %s @ %s in main memory\n" % (
+                        util.hex_str(byte, 2),
+                        byte,
+                        memory.get_block(address),
+                        util.bin_str(address, self.memory_size)
+                    )
                 )
-            )
-
-        elif self.write_policy == Cache.WRITE_BACK:
-            if not written:
-                # Write block to cache
-                block = self.memory.get_block(address)
-
-                victim = self.cache.load(address, block)
-                written = self.cache.write(address, byte)
 
+        elif self.write_policy == Cache.WRITE_BACK and self.verbose:
             print()
             print("Byte 0x%s (%s) written @ %s in cache\n" % (
                     util.hex_str(byte, 2),
@@ -200,6 +326,116 @@ class Simulator:
                 )
             )
 
+    def allocate(self, address, tenant=0, kind=None):
+        """
+        Load the block containing an address into the cache after a miss,
+        taking it from the victim cache when possible.
+
+        :param int address: memory address that missed in the cache
+        :param int tenant: tenant the block is loaded for
+        :param str kind: type of the miss, as classified by MissClassifier
+        :return: boolean indicating whether the block came from the victim cache
+        """
+
+        swapped = self.cache.fetch_victim(address, tenant)
+
+        if swapped:
+            block, modified = swapped
+            self.victim_hits += 1
+
+            if kind == MissClassifier.CONFLICT:
+                self.victim_conflict_hits += 1
+        else:
+            block, modified = self.get_memory(tenant).get_block(address), 0
+
+        victim = self.cache.load(address, block, modified, tenant)
+
+        # Write victim line's block to its owner's memory if replaced
+        if victim:
+            self.get_memory(victim[2]).set_block(victim[0], victim[1])
+
+        return swapped is not None
+
+    def get_memory(self, tenant):
+        """
+        Get the main memory backing a tenant's address space, creating it on
+        the tenant's first access.
+
+        :param int tenant: tenant to get the memory of.
+        :return: Memory of the tenant.
+        """
+
+        if tenant not in self.memories:
+            self.memories[tenant] = Memory(self.memory.get_size(), self.memory.get_block_size())
+
+        return self.memories[tenant]
+
+    def record(self, address, hit, tenant):
+        """
+        Record an access in the tenant's statistics and utility monitor.
+
+        :param int address: memory address being accessed
+        :param bool hit: whether the access hit in the cache
+        :param int tenant: tenant making the access
+        """
+
+        stats = self.tenant_stats.setdefault(tenant, {"hits": 0, "misses": 0})
+        stats["hits" if hit else "misses"] += 1
+
+        if self.partitioner:
+            self.partitioner.access(address, tenant)
+
+    def get_stats(self):
+        """
+        Get statistics about the cache's performance.
+
+        :return: dict of hits, misses, hit ratio, miss breakdown and per-tenant
+                 statistics, plus MSHR timing statistics when the non-blocking
+                 model is enabled.
+        """
+
+        stats = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "ratio": (self.hits / ((self.hits + self.misses) if self.misses else 1)) * 100,
+            "compulsory_misses": self.classifier.misses[MissClassifier.COMPULSORY],
+            "capacity_misses": self.classifier.misses[MissClassifier.CAPACITY],
+            "conflict_misses": self.classifier.misses[MissClassifier.CONFLICT],
+            "victim_hits": self.victim_hits,
+            "victim_conflict_hits": self.victim_conflict_hits,
+            "tenants": {}
+        }
+
+        if self.classifier.ways:
+            stats["mod_conflict_misses"] = self.classifier.baseline_conflicts
+
+        occupancy = self.cache.get_occupancy()
+        all_ways = (1 << self.cache.mapping_policy) - 1
+
+        for tenant in sorted(set(self.tenant_stats) | set(occupancy)):
+            tenant_stats = self.tenant_stats.get(tenant, {"hits": 0, "misses": 0})
+
+            stats["tenants"][tenant] = {
+                "hits": tenant_stats["hits"],
+                "misses": tenant_stats["misses"],
+                "occupancy": occupancy.get(tenant, 0),
+                "way_mask": self.cache.way_masks.get(tenant, all_ways)
+            }
+
+        if self.mshr:
+            stats.update({
+                "cycles": self.mshr.get_cycles(),
+                "blocking_cycles": self.mshr.get_blocking_cycles(),
+                "stall_cycles": self.mshr.stall_cycles,
+                "primary_misses": self.mshr.primary_misses,
+                "secondary_misses": self.mshr.secondary_misses,
+                "mlp": self.mshr.get_mlp(),
+                "mshr_occupancy": self.mshr.get_occupancy(),
+                "peak_mshr_occupancy": self.mshr.peak_occupancy
+            })
+
+        return stats
+
     def print_details(self):
         """
         Print the details of the simulation.
@@ -229,26 +465,45 @@ class Simulator:
         print("Mapping policy: %s" % ("direct" if self.mapping_policy == 0 else mapping_str))
         print("Replacement policy: %s" % self.replacement_policy)
         print("Write policy: %s" % self.write_policy)
+        print("Index function: %s" % self.index_function)
+        print("Victim cache: %s" % ("%s lines" % self.victim_entries if self.victim_entries else "none"))
+        print("Way partitioning: %s" % (
+                "utility-based every %s accesses" % self.partitioner.interval if self.partitioner else "static"
+            )
+        )
+        print("MSHRs: %s" % (
+                "%s (hit latency %s, miss latency %s cycles)" % (
+                    self.mshr.entries,
+                    self.mshr.hit_latency,
+                    self.mshr.miss_latency
+                ) if self.mshr else "none (blocking)"
+            )
+        )
         print()
 
         print(
             "Commands\n" +
             "usage: COMMAND PARAM PARAM\n" +
-            "* ADDRESS, BYTE, AMOUNT, START, & LENGTH must be an integer\n\n"
+            "* ADDRESS, BYTE, AMOUNT, START, LENGTH, & TENANT must be an integer\n"
+            "* TENANT is optional and defaults to 0\n\n"
             
-            "write ADDRESS BYTE - write byte from memory\n" +
-            "read ADDRESS - read byte from memory\n" +
-            "randwrite AMOUNT - write random byte to random location in memory AMOUNT times\n" +
-            "randread AMOUNT - read byte from random location in memory AMOUNT times\n" +
+            "write ADDRESS BYTE TENANT - write byte from memory\n" +
+            "read ADDRESS TENANT - read byte from memory\n" +
+            "randwrite AMOUNT TENANT - write random byte to random location in memory AMOUNT times\n" +
+            "randread AMOUNT TENANT - read byte from random location in memory AMOUNT times\n" +
+            "waymask TENANT MASK - only let TENANT allocate into the ways set in binary MASK (or all), unless partitioning by utility\n" +
+            "trace FORMAT PATH TENANT - replay a " + ", ".join(FORMATS) + " trace file\n" +
             "printcache START LENGTH - print LENGTH lines of cache from START\n" +
-            "printmem START LENGTH - print LENGTH blocks of memory from START\n" +
-            "stats - print out hits, misses, and hit/miss ratio\n" +
+            "printmem START LENGTH TENANT - print LENGTH blocks of TENANT's memory from START\n" +
+            "stats - print out hits, misses, hit/miss ratio, and miss breakdown (plus MLP and stalls with MSHRs)\n" +
             "help - prints this message\n" +
             "quit - quit the simulator\n"
         )
 
 
 if __name__ == '__main__':
+    from pyfiglet import Figlet
+
     custom_fig = Figlet(font='slant')
     print(custom_fig.renderText('cpu cache simulator'))
     print("This is a simulator for a CPU cache that I wrote for CSC 218 Computer Organization.\n" +
@@ -262,6 +517,10 @@ if __name__ == '__main__':
     mapping_policy = 0
     replacement_policy = ""
     write_policy = ""
+    index_function = ""
+    victim_entries = 0
+    mshrs = 0
+    partition_interval = 0
 
     while True:
         response = input("Size of Main Memory (in 2^N bytes) > ")
@@ -317,13 +576,53 @@ if __name__ == '__main__':
 
         print(INVALID_RESPONSE)
 
+    while True:
+        response = input("Set index function for cache {" + ", ".join(INDEX_FUNCTIONS) + "} > ")
+
+        if any(function.lower() == response.lower() for function in INDEX_FUNCTIONS):
+            index_function = response.upper()
+            break
+
+        print(INVALID_RESPONSE)
+
+    while True:
+        response = input("Lines in victim cache (0 for none) > ")
+
+        if response.isdigit():
+            victim_entries = int(response)
+            break
+
+        print(INVALID_RESPONSE)
+
+    while True:
+        response = input("Number of MSHRs for a non-blocking cache (0 for blocking) > ")
+
+        if response.isdigit():
+            mshrs = int(response)
+            break
+
+        print(INVALID_RESPONSE)
+
+    while True:
+        response = input("Accesses between utility-based way repartitions (0 for static) > ")
+
+        if response.isdigit():
+            partition_interval = int(response)
+            break
+
+        print(INVALID_RESPONSE)
+
     simulator = Simulator(
         memory_size,
         cache_size,
         block_size,
         mapping_policy,
         replacement_policy,
-        write_policy
+        write_policy,
+        mshrs,
+        index_function=index_function,
+        victim_entries=victim_entries,
+        partition_interval=partition_interval
     )
 
     simulator.run()
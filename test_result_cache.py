@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""test_result_cache.py - tests for the on-disk cache of simulation results.
+See README.md or https://github.com/nicholasadamou/cpu-cache-simulator
+for more information.
+
+Copyright (C) Nicholas Adamou 2019
+cpu-cache-simulator is released under the Apache 2.0 license. See
+LICENSE for the full license text.
+"""
+
+import os
+import tempfile
+import unittest
+
+from result_cache import ResultCache
+
+CONFIG = {
+    "memory_size": 12,
+    "cache_size": 8,
+    "block_size": 4,
+    "mapping_policy": 1,
+    "replacement_policy": "LRU",
+    "write_policy": "WB"
+}
+
+TRACE = b"".join(b"0 %x\n" % (address % 8 * 16) for address in range(64))
+
+
+class ResultCacheTest(unittest.TestCase):
+    """Tests for ResultCache."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(os.path.join(self.directory.name, "cache"))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_trace(self, name, data, mode="wb"):
+        """Write a trace file and return its path."""
+
+        path = os.path.join(self.directory.name, name)
+
+        with open(path, mode) as file:
+            file.write(data)
+
+        return path
+
+    def simulate_fresh(self, path):
+        """Get the stats of a trace from an empty cache."""
+
+        return ResultCache(os.path.join(self.directory.name, "fresh")).simulate(path, "din", CONFIG)
+
+    def test_exact_hit(self):
+        path = self.write_trace("trace.din", TRACE)
+        stats = self.cache.simulate(path, "din", CONFIG)
+
+        self.assertEqual(self.cache.simulate(path, "din", CONFIG), stats)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_resumes_after_append(self):
+        path = self.write_trace("trace.din", TRACE)
+        self.cache.simulate(path, "din", CONFIG)
+
+        self.write_trace("trace.din", TRACE, "ab")
+        stats = self.cache.simulate(path, "din", CONFIG)
+
+        self.assertEqual(self.cache.resumes, 1)
+        self.assertEqual((stats["hits"], stats["misses"]), (120, 8))
+
+        fresh = self.simulate_fresh(path)
+
+        self.assertEqual((stats["hits"], stats["misses"]), (fresh["hits"], fresh["misses"]))
+
+    def test_no_resume_after_append_mid_line(self):
+        path = self.write_trace("trace.din", TRACE + b"0 1")
+        self.cache.simulate(path, "din", CONFIG)
+
+        # The prefix ended in the middle of "0 10", which must not be read as "0 1"
+        self.write_trace("trace.din", b"0\n", "ab")
+        stats = self.cache.simulate(path, "din", CONFIG)
+
+        self.assertEqual(self.cache.resumes, 0)
+        self.assertEqual(stats, self.simulate_fresh(path))
+
+    def test_replays_whole_trace_when_prefix_is_evicted(self):
+        path = self.write_trace("trace.din", TRACE)
+        self.cache.simulate(path, "din", CONFIG)
+
+        # Another run evicts the prefix's pickle after its metadata was listed
+        for name in os.listdir(self.cache.directory):
+            if name.endswith(".pickle"):
+                os.remove(os.path.join(self.cache.directory, name))
+
+        self.write_trace("trace.din", TRACE, "ab")
+        stats = self.cache.simulate(path, "din", CONFIG)
+
+        self.assertEqual(self.cache.resumes, 0)
+        self.assertEqual((stats["hits"], stats["misses"]), (120, 8))
+
+    def test_evicts_least_recently_used(self):
+        first = self.write_trace("first.din", TRACE)
+        second = self.write_trace("second.din", TRACE.replace(b"0 ", b"1 "))
+        self.cache.simulate(first, "din", CONFIG)
+
+        # Give the first entry an older timestamp and room for one entry only
+        size = 0
+
+        for name in os.listdir(self.cache.directory):
+            path = os.path.join(self.cache.directory, name)
+            size += os.path.getsize(path)
+            os.utime(path, (0, 0))
+
+        self.cache.max_size = size + size // 2
+        self.cache.simulate(second, "din", CONFIG)
+        self.cache.simulate(first, "din", CONFIG)
+
+        self.assertEqual(self.cache.hits, 0)
+        self.assertEqual(len(os.listdir(self.cache.directory)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
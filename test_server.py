@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""test_server.py - tests for the local simulation service.
+See README.md or https://github.com/nicholasadamou/cpu-cache-simulator
+for more information.
+
+Copyright (C) Nicholas Adamou 2019
+cpu-cache-simulator is released under the Apache 2.0 license. See
+LICENSE for the full license text.
+"""
+
+import asyncio
+import os
+import unittest
+
+from server import LocalClient, SimulationError, SimulationServer, create_simulator, delete_simulator, run_batches
+
+CONFIG = {
+    "memory_size": 12,
+    "cache_size": 8,
+    "block_size": 4,
+    "mapping_policy": 1,
+    "replacement_policy": "LRU",
+    "write_policy": "WB"
+}
+
+
+class SimulationServerTest(unittest.IsolatedAsyncioTestCase):
+    """Tests for SimulationServer driven through a LocalClient."""
+
+    async def asyncSetUp(self):
+        self.server = SimulationServer(2)
+        self.client = LocalClient(self.server)
+
+        await self.client.create("cache", **CONFIG)
+
+    async def asyncTearDown(self):
+        self.server.close()
+
+    async def test_coalesces_queued_batches(self):
+        results = await asyncio.gather(
+            self.client.access("cache", [["R", 0], ["R", 1]]),
+            self.client.access("cache", [["W", 16]]),
+            self.client.access("cache", [["R", 16]], tenant=1)
+        )
+
+        self.assertEqual(results, [
+            {"hits": 1, "misses": 1},
+            {"hits": 0, "misses": 1},
+            {"hits": 0, "misses": 1}
+        ])
+        self.assertEqual(self.server.replays, 1)
+        self.assertEqual(self.server.batches, 3)
+
+        stats = await self.client.stats("cache")
+
+        # Tenant 1 has its own address space, so it misses on tenant 0's block
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 3))
+        self.assertEqual(sorted(stats["tenants"]), [0, 1])
+
+    async def test_malformed_batch_fails_alone(self):
+        results = await asyncio.gather(
+            self.client.access("cache", [["R", 0]]),
+            self.client.access("cache", [["R", 16]]),
+            self.client.access("cache", [["R", "zz"]]),
+            return_exceptions=True
+        )
+
+        self.assertEqual(results[:2], [{"hits": 0, "misses": 1}, {"hits": 0, "misses": 1}])
+        self.assertIsInstance(results[2], SimulationError)
+
+    async def test_delete_fails_requests_queued_behind_it(self):
+        results = await asyncio.gather(
+            self.client.access("cache", [["R", 0]]),
+            self.client.delete("cache"),
+            self.client.stats("cache"),
+            return_exceptions=True
+        )
+
+        self.assertEqual(results[0], {"hits": 0, "misses": 1})
+        self.assertIsNone(results[1])
+        self.assertIsInstance(results[2], SimulationError)
+        self.assertEqual(await self.client.list(), [])
+
+        await self.client.create("cache", **CONFIG)
+
+        self.assertEqual((await self.client.stats("cache"))["misses"], 0)
+
+    async def test_cancelled_requests_do_not_stall_the_queue(self):
+        tasks = [asyncio.create_task(request) for request in (
+            self.client.access("cache", [["R", 0]]),
+            self.client.access("cache", [["R", 16]]),
+            self.client.stats("cache"),
+            self.client.delete("cache"),
+            self.client.stats("cache")
+        )]
+
+        # Let every request queue up before the simulator's queue is drained
+        await asyncio.sleep(0)
+
+        for index in (0, 2, 3):
+            tasks[index].cancel()
+
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.assertEqual(results[1], {"hits": 0, "misses": 1})
+        self.assertIsInstance(results[4], SimulationError)
+        self.assertEqual(await self.client.list(), [])
+
+    async def test_failed_create_forgets_name(self):
+        with self.assertRaises(SimulationError):
+            await self.client.create("broken", memory_size=12)
+
+        self.assertEqual(await self.client.list(), ["cache"])
+
+    async def test_rejects_malformed_requests(self):
+        for request in ([1], 3, None, {"command": "nope"}, {"command": "stats", "name": "missing"}):
+            self.assertIn("error", await self.server.handle(request))
+
+    async def test_socket_answers_every_line(self):
+        path = "test_server.sock"
+        serving = asyncio.create_task(self.server.serve(path=path))
+
+        try:
+            for _ in range(100):
+                try:
+                    reader, writer = await asyncio.open_unix_connection(path)
+                    break
+                except OSError:
+                    await asyncio.sleep(0.01)
+
+            writer.write(b'[1]\nnot json\n{"id": 7, "command": "list"}\n')
+            await writer.drain()
+
+            responses = [await reader.readline() for _ in range(3)]
+
+            self.assertIn(b'"names": ["cache"], "id": 7', b"".join(responses))
+            self.assertEqual(sum(b'"error"' in response for response in responses), 2)
+
+            writer.close()
+        finally:
+            serving.cancel()
+
+            try:
+                await serving
+            except asyncio.CancelledError:
+                pass
+
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class RunBatchesTest(unittest.TestCase):
+    """Tests for the replays run in a worker process."""
+
+    def test_failing_batch_fails_alone(self):
+        create_simulator("batches", CONFIG)
+
+        try:
+            results = run_batches("batches", [
+                ([("R", 0, 1)], 0),
+                ([("R", None, 1)], 0),
+                ([("R", 0, 1)], 0)
+            ])
+        finally:
+            delete_simulator("batches")
+
+        self.assertEqual(results[0], {"hits": 0, "misses": 1})
+        self.assertIn("error", results[1])
+        self.assertEqual(results[2], {"hits": 1, "misses": 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""test_traces.py - tests for the trace file importers.
+See README.md or https://github.com/nicholasadamou/cpu-cache-simulator
+for more information.
+
+Copyright (C) Nicholas Adamou 2019
+cpu-cache-simulator is released under the Apache 2.0 license. See
+LICENSE for the full license text.
+"""
+
+import io
+import unittest
+
+from traces import CHAMPSIM_RECORD, IFETCH, READ, WRITE, read_champsim, read_din, read_lackey
+
+
+def read(reader, data, block_size=16):
+    """Read every access of an in-memory trace."""
+
+    return [access for accesses in reader(io.BytesIO(data), block_size) for access in accesses]
+
+
+class ReadDinTest(unittest.TestCase):
+    """Tests for read_din."""
+
+    def test_skips_comments_and_flushes(self):
+        trace = b"# din trace\n0 10\n4 20\n\n1 30 2\n2 40\nfoo bar\n7 50\n3 60\n"
+
+        self.assertEqual(read(read_din, trace), [
+            (READ, 0x10, 1),
+            (WRITE, 0x30, 2),
+            (IFETCH, 0x40, 1),
+            (READ, 0x60, 1)
+        ])
+
+    def test_splits_accesses_at_block_boundaries(self):
+        self.assertEqual(read(read_din, b"0 1c 8\n1 20 20\n"), [
+            (READ, 0x1c, 4),
+            (READ, 0x20, 4),
+            (WRITE, 0x20, 16),
+            (WRITE, 0x30, 16)
+        ])
+
+
+class ReadLackeyTest(unittest.TestCase):
+    """Tests for read_lackey."""
+
+    def test_modify_is_a_read_then_a_write(self):
+        trace = b"==123== Lackey\nI  04000000,3\n L 10,4\n S 20,4\n M 30,4\n==123== done\n"
+
+        self.assertEqual(read(read_lackey, trace), [
+            (IFETCH, 0x04000000, 3),
+            (READ, 0x10, 4),
+            (WRITE, 0x20, 4),
+            (READ, 0x30, 4),
+            (WRITE, 0x30, 4)
+        ])
+
+
+class ReadChampSimTest(unittest.TestCase):
+    """Tests for read_champsim."""
+
+    def test_unpacks_records_and_drops_partial_record(self):
+        first = CHAMPSIM_RECORD.pack(0x400, 0, 0, 0, 0, 0, 0, 0, 0, 0x200, 0, 0x100, 0, 0x13c, 0)
+        second = CHAMPSIM_RECORD.pack(0x404, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+
+        self.assertEqual(read(read_champsim, first + second + second[:10]), [
+            (IFETCH, 0x400, 1),
+            (READ, 0x100, 8),
+            (READ, 0x13c, 4),
+            (READ, 0x140, 4),
+            (WRITE, 0x200, 8),
+            (IFETCH, 0x404, 1)
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
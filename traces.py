@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""traces.py - streaming importers for memory access trace files.
+See README.md or https://github.com/nicholasadamou/cpu-cache-simulator
+for more information.
+
+Copyright (C) Nicholas Adamou 2019
+cpu-cache-simulator is released under the Apache 2.0 license. See
+LICENSE for the full license text.
+"""
+
+import bz2
+import gzip
+import lzma
+import struct
+
+import util
+
+# Access types
+READ = "R"
+WRITE = "W"
+IFETCH = "I"
+
+# Dinero IV din labels
+DIN_LABELS = {
+    0: READ,
+    1: WRITE,
+    2: IFETCH,
+    3: READ  # unknown access type
+}
+
+# ChampSim input_instr record: ip, is_branch, branch_taken,
+# destination_registers[2], source_registers[4],
+# destination_memory[2], source_memory[4]
+CHAMPSIM_RECORD = struct.Struct("<QBB2B4B2Q4Q")
+CHAMPSIM_ACCESS_SIZE = 8
+
+# File extension -> function opening a compressed trace
+COMPRESSED = {
+    ".gz": gzip.open,
+    ".xz": lzma.open,
+    ".bz2": bz2.open
+}
+
+
+def open_trace(trace):
+    """
+    Open a trace file for binary reading, decompressing it if needed.
+
+    :param trace: path of the trace file, or a file object opened in binary mode.
+    :return: binary file object.
+    """
+
+    if not isinstance(trace, str):
+        return trace
+
+    for extension, open_compressed in COMPRESSED.items():
+        if trace.endswith(extension):
+            return open_compressed(trace, "rb")
+
+    return open(trace, "rb")
+
+
+def split(op, address, size, block_size):
+    """
+    Split an access into one access per block of memory it touches.
+
+    :param str op: access type.
+    :param int address: address of the first byte accessed.
+    :param int size: number of bytes accessed.
+    :param int block_size: size of a block of memory in bytes.
+    :return: generator of (op, address, size) tuples.
+    """
+
+    while True:
+        amount = min(size, block_size - (address % block_size))
+
+        yield op, address, amount
+
+        address += amount
+        size -= amount
+
+        if size <= 0:
+            break
+
+
+def batch(accesses, block_size, chunk_size):
+    """
+    Split accesses across block boundaries and group them into chunks.
+
+    :param accesses: iterable of (op, address, size) tuples.
+    :param int block_size: size of a block of memory in bytes.
+    :param int chunk_size: number of accesses per chunk.
+    :return: generator of lists of (op, address, size) tuples.
+    """
+
+    chunk = []
+
+    for op, address, size in accesses:
+        chunk.extend(split(op, address, size, block_size))
+
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def read_din(trace, block_size, chunk_size=4096):
+    """
+    Read a Dinero IV din trace, made up of lines of a label (0 read, 1 write,
+    2 instruction fetch, 3 unknown, 4 flush), a hexadecimal address and an
+    optional hexadecimal size in bytes. Flushes and lines without a known
+    label, such as comments, are skipped.
+
+    :param trace: path of the trace file, or a file object opened in binary mode.
+    :param int block_size: size of a block of memory in bytes.
+    :param int chunk_size: number of accesses per chunk.
+    :return: generator of lists of (op, address, size) tuples.
+    """
+
+    def accesses(file):
+        for line in file:
+            fields = line.split()
+
+            # Skip comments, flushes and anything else without a known label
+            if len(fields) < 2 or not fields[0].isdigit() or int(fields[0]) not in DIN_LABELS:
+                continue
+
+            yield (
+                DIN_LABELS[int(fields[0])],
+                int(fields[1], 16),
+                int(fields[2], 16) if len(fields) > 2 else 1
+            )
+
+    with open_trace(trace) as file:
+        yield from batch(accesses(file), block_size, chunk_size)
+
+
+def read_lackey(trace, block_size, chunk_size=4096):
+    """
+    Read a trace written by valgrind --tool=lackey --trace-mem=yes, made up of
+    lines like " L 04222cac,8". Modifies are read as a load then a store, and
+    lines from valgrind itself (starting with ==) are skipped.
+
+    :param trace: path of the trace file, or a file object opened in binary mode.
+    :param int block_size: size of a block of memory in bytes.
+    :param int chunk_size: number of accesses per chunk.
+    :return: generator of lists of (op, address, size) tuples.
+    """
+
+    def accesses(file):
+        for line in file:
+            fields = line.split()
+
+            if len(fields) != 2 or b"," not in fields[1]:
+                continue
+
+            address, size = fields[1].split(b",")
+            address = int(address, 16)
+            size = int(size)
+
+            if fields[0] == b"I":
+                yield IFETCH, address, size
+            elif fields[0] == b"L":
+                yield READ, address, size
+            elif fields[0] == b"S":
+                yield WRITE, address, size
+            elif fields[0] == b"M":
+                yield READ, address, size
+                yield WRITE, address, size
+
+    with open_trace(trace) as file:
+        yield from batch(accesses(file), block_size, chunk_size)
+
+
+def read_champsim(trace, block_size, chunk_size=4096):
+    """
+    Read a ChampSim-style binary trace of 64-byte instruction records. Each
+    record is read as an instruction fetch of its ip followed by a load from
+    every source memory operand and a store to every destination memory
+    operand. ChampSim does not record operand sizes, so every load and store
+    is assumed to be 8 bytes.
+
+    :param trace: path of the trace file, or a file object opened in binary mode.
+    :param int block_size: size of a block of memory in bytes.
+    :param int chunk_size: number of accesses per chunk.
+    :return: generator of lists of (op, address, size) tuples.
+    """
+
+    def accesses(file):
+        while True:
+            record = file.read(CHAMPSIM_RECORD.size)
+
+            if len(record) < CHAMPSIM_RECORD.size:
+                break
+
+            fields = CHAMPSIM_RECORD.unpack(record)
+
+            yield IFETCH, fields[0], 1
+
+            for address in fields[11:15]:
+                if address:
+                    yield READ, address, CHAMPSIM_ACCESS_SIZE
+
+            for address in fields[9:11]:
+                if address:
+                    yield WRITE, address, CHAMPSIM_ACCESS_SIZE
+
+    with open_trace(trace) as file:
+        yield from batch(accesses(file), block_size, chunk_size)
+
+
+FORMATS = {
+    "din": read_din,
+    "lackey": read_lackey,
+    "champsim": read_champsim
+}
+
+
+def replay(simulator, batches, tenant=0):
+    """
+    Feed batches of accesses into a simulator. Addresses are wrapped around
+    the simulator's memory size, instruction fetches are read like data, and
+    every write stores a random byte since traces do not record data.
+
+    :param Simulator simulator: simulator to replay the accesses into.
+    :param batches: iterable of lists of (op, address, size) tuples.
+    :param int tenant: tenant making the accesses.
+    :return: number of accesses replayed.
+    """
+
+    mask = simulator.memory.get_size() - 1
+    amount = 0
+
+    for accesses in batches:
+        for op, address, size in accesses:
+            if op == WRITE:
+                simulator.write(address & mask, util.rand_byte(), tenant)
+            else:
+                simulator.read(address & mask, tenant)
+
+        amount += len(accesses)
+
+    return amount
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""victim_cache.py - represents a small fully-associative victim cache.
+See README.md or https://github.com/nicholasadamou/cpu-cache-simulator
+for more information.
+
+Copyright (C) Nicholas Adamou 2019
+cpu-cache-simulator is released under the Apache 2.0 license. See
+LICENSE for the full license text.
+"""
+
+from collections import OrderedDict
+
+
+class VictimCache:
+    """
+    Class representing a small fully-associative victim cache that holds
+    the lines most recently evicted from the main cache, replaced in LRU
+    order. Lines are tagged with the tenant that owned them, since every
+    tenant has its own address space.
+    """
+
+    def __init__(self, entries):
+        self.entries = entries  # Number of lines in the victim cache
+
+        self.lines = OrderedDict()  # (block address, owner) -> [data, modified]
+
+    def insert(self, address, data, modified, owner=0):
+        """
+        Insert a line evicted from the main cache.
+
+        :param int address: memory address of the evicted block
+        :param list data: block of memory held by the evicted line
+        :param int modified: modified bit of the evicted line
+        :param int owner: tenant that owned the evicted line
+        :return: tuple containing victim address, data and owner if a
+                 modified line leaves the victim cache, otherwise an empty tuple
+        """
+
+        self.lines[(address, owner)] = [data, modified]
+        self.lines.move_to_end((address, owner))
+
+        if len(self.lines) > self.entries:
+            (victim_address, victim_owner), (victim_data, victim_modified) = self.lines.popitem(last=False)
+
+            if victim_modified:
+                return victim_address, victim_data, victim_owner
+
+        return ()
+
+    def fetch(self, address, owner=0):
+        """
+        Remove a block from the victim cache.
+
+        :param int address: memory address of the block to fetch
+        :param int owner: tenant whose block to fetch
+        :return: tuple containing the block and its modified bit (None if the
+                 block is not in the victim cache)
+        """
+
+        line = self.lines.pop((address, owner), None)
+
+        if line is None:
+            return None
+
+        return line[0], line[1]
+
+    def write(self, address, offset, byte, owner=0):
+        """
+        Write a byte to a block held in the victim cache.
+
+        :param int address: memory address of the block to write to
+        :param int offset: offset of the byte within the block
+        :param int byte: byte of data to write
+        :param int owner: tenant whose block to write to
+        :return: boolean indicating whether data was written to the victim cache
+        """
+
+        line = self.lines.get((address, owner))
+
+        if line is None:
+            return False
+
+        line[0][offset] = byte
+        line[1] = 1
+
+        return True